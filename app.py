@@ -1,8 +1,16 @@
+import re
+import json
+import time
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import timedelta
-from supabase import create_client, Client
+from pathlib import Path
+from supabase import create_client, Client, ClientOptions
 
 # ---------- Page Configuration ---------- #
 st.set_page_config(page_title="Julien's Elite Dashboard", layout="wide")
@@ -17,161 +25,448 @@ st.title("🏋️ Julien's Workout Dashboard")
 st.markdown("Tracking sets, volume, intensity, and personal bests 🏅.")
 
 # ---------- Supabase Connection ---------- #
+# cache_resource makes this one client per process, shared by every session,
+# so all queries reuse its keep-alive HTTP pool; the timeout stops a stalled
+# request from hanging the page for the library's 120 s default
+QUERY_TIMEOUT = 10  # seconds
+
 @st.cache_resource
 def init_connection():
     try:
         url = st.secrets["connections"]["supabase"]["url"]
         key = st.secrets["connections"]["supabase"]["key"]
-        return create_client(url, key)
+        return create_client(url, key, options=ClientOptions(postgrest_client_timeout=QUERY_TIMEOUT))
     except Exception as e:
         st.error("Missing Secrets! Ensure url and key are set in Streamlit Cloud.")
         st.stop()
 
 supabase = init_connection()
 
+# ---------- Calculations & Logic ---------- #
+
+# 1. Epley 1RM Formula
+def estimate_1rm(weight, reps):
+    # Vectorized over NumPy arrays (plain scalars work too)
+    return np.where(reps > 1, weight * (1 + reps/30), weight)
+
+# 2. PR Detection (Gold Medals)
+def assign_prs(data):
+    w = data["Actual Weight (kg)"].to_numpy()
+    reps = data["Reps"].to_numpy()
+    # Per-exercise maxima are reduced straight into arrays indexed by
+    # category code, then gathered back per row (code -1 = no exercise)
+    codes = data["Exercise"].cat.codes.to_numpy()
+    named = codes >= 0
+    n = len(data["Exercise"].cat.categories)
+    # Heaviest weight lifted for weighted exercises (column 0) and max reps
+    # for bodyweight exercises at 0kg (column 1), reduced in a single pass;
+    # the two masks are built once and reused for the PR flag below
+    weighted, bodyweight = w > 0, w == 0
+    candidates = np.column_stack([np.where(weighted, w, 0), np.where(bodyweight, reps, -1)])
+    maxes = np.full((n, 2), -1.0)
+    np.maximum.at(maxes, codes[named], candidates[named])
+    max_w, max_r = maxes[codes, 0], maxes[codes, 1]
+
+    is_pr = (weighted & (w == max_w)) | (bodyweight & (reps == max_r))
+    # Stored as bool; the medal is only rendered for the displayed slice
+    data["PR"] = is_pr & named
+    return data
+
+# 3. Workout Classification (Push/Pull/Lower)
+LOWER_RE = re.compile("squat|deadlift|lunge|leg|hamstring|calf|hip thrust|thrust|glute|rdl|good morning", re.IGNORECASE)
+PUSH_RE = re.compile("bench|overhead press|shoulder press|incline|dip|push|tricep|pec", re.IGNORECASE)
+PULL_RE = re.compile("row|pulldown|pull-up|curl|face pull|shrug|chin|lat", re.IGNORECASE)
+
+def classify_exercise(names):
+    # Lower beats Push beats Pull when a name matches several keywords;
+    # a missing name matches nothing and falls through to Other
+    return np.select(
+        [names.str.contains(LOWER_RE, na=False), names.str.contains(PUSH_RE, na=False),
+         names.str.contains(PULL_RE, na=False)],
+        ["Lower", "Push", "Pull"],
+        default="Other"
+    )
+
+# 4. Weekly Summary Aggregation
+def build_weekly_summary(data):
+    # Volume is stored as float32 but summed in float64, so the weekly
+    # totals (and the ACWR built on them) don't drift with the row count
+    return (
+        data.astype({"Volume (kg)": "float64"})
+          .groupby("Week", as_index=False, sort=False)  # ordered by the sort_values below
+          .agg({
+              "Volume (kg)": "sum",
+              "Actual Weight (kg)": "max",
+              "Reps": "sum",
+              "Exercise": "nunique"
+          })
+          .rename(columns={
+              "Volume (kg)": "Total Volume",
+              "Actual Weight (kg)": "Heaviest Lift",
+              "Reps": "Total Reps",
+              "Exercise": "Unique Exercises"
+          })
+          .sort_values("Week", ascending=False)
+          # Sorted on the integer key, then shown as an ISO label (2024-W05)
+          .assign(Week=lambda t: (t["Week"] // 100).astype(str) + "-W" + (t["Week"] % 100).astype(str).str.zfill(2))
+    )
+
 # ---------- Load & Process Data ---------- #
-@st.cache_data(ttl=600)
-def load_data():
+# Cardio is excluded in Postgres (case-insensitive ILIKE), so those rows
+# never cross the wire; the row count probe applies the same filter.
+CARDIO_PATTERNS = ("%stair stepper%", "%cycling%")
+# NULL NOT ILIKE x is NULL, which would drop unnamed sets too; they are kept
+# explicitly, as the client-side filter did
+CARDIO_FILTER = "exercise.is.null,and(" + ",".join(f"exercise.not.ilike.{p}" for p in CARDIO_PATTERNS) + ")"
+# Only the columns the dashboard reads are requested
+WORKOUT_COLUMNS = "date,exercise,reps,weight_kg,multiplier,set_order,note"
+RAW_COLUMNS = WORKOUT_COLUMNS.split(",")
+
+# Local snapshot of the enriched frame, so a cold start (new process,
+# expired cache) skips both the full download and the enrichment when the
+# table is unchanged.
+LOCAL_CACHE = Path.home() / ".workout_enriched.parquet"
+# Its fingerprint rides in the file's own key-value metadata, so frame and
+# fingerprint can only ever be replaced together
+LOCAL_CACHE_META_KEY = b"workout_snapshot"
+# Counted from the last full download, so it bounds how long an in-place
+# edit to an older set can go unseen
+LOCAL_CACHE_MAX_AGE = 24 * 3600  # seconds
+# Bump whenever enrich() changes what it derives, so snapshots of the old
+# columns are rebuilt instead of served
+SNAPSHOT_VERSION = 1
+
+ROW_LIMIT = 10000
+DATA_TTL = 600  # seconds before the loader checks Supabase again
+
+def workouts_query(columns, **kwargs):
+    return supabase.table("workouts").select(columns, **kwargs).or_(CARDIO_FILTER)
+
+def snapshot_fingerprint(response):
+    # Row count + newest timestamp of a count="exact" query sorted newest first.
+    # The column list and snapshot version are part of it, so a snapshot taken
+    # with another projection or older enrich logic is not reused
+    latest = response.data[0]["date"] if response.data else None
+    return {"count": response.count, "latest": latest, "columns": WORKOUT_COLUMNS, "schema": SNAPSHOT_VERSION}
+
+def fetch_workouts(since=None):
     # 1. Fetch Data: Sort by Date (newest) AND Set Order (1, 2, 3...)
-    response = supabase.table("workouts") \
-        .select("*") \
+    query = workouts_query(WORKOUT_COLUMNS, count="exact")
+    if since is not None:
+        query = query.gt("date", since)
+    response = query \
         .order("date", desc=True) \
         .order("set_order", desc=False) \
-        .limit(10000).execute()
-    
-    data = pd.DataFrame(response.data)
-    if data.empty: return data
+        .limit(ROW_LIMIT).execute()
+    # Arrow builds the typed columns from the JSON records in C (pyarrow ships with streamlit);
+    # the fingerprint is read off this same response, so it describes exactly these rows
+    return pa.Table.from_pylist(response.data).to_pandas(), snapshot_fingerprint(response)
+
+def table_fingerprint():
+    # A one-row probe instead of the full table
+    response = workouts_query("date", count="exact") \
+        .order("date", desc=True) \
+        .limit(1).execute()
+    return snapshot_fingerprint(response)
 
-    # 2. Type Conversion
-    data["Date"] = pd.to_datetime(data["date"], errors="coerce", utc=True).dt.tz_localize(None)
-    data["Day"] = data["Date"].dt.date
-    data["Exercise"] = data["exercise"]
-    data["Reps"] = pd.to_numeric(data["reps"], errors='coerce').fillna(0)
-    data["Weight_Single_KG"] = pd.to_numeric(data["weight_kg"], errors='coerce').fillna(0)
-    data["Multiplier"] = pd.to_numeric(data["multiplier"], errors='coerce').fillna(1)
-    data["Set_Order"] = pd.to_numeric(data["set_order"], errors='coerce').fillna(1)
-    
-    # 3. Filtering
-    data = data.dropna(subset=["Day"])
-    data = data[~data["Exercise"].str.contains("Stair Stepper|Cycling", case=False, na=False)]
+def read_local_cache():
+    try:
+        # One open file for both reads, so a concurrent replace can't pair
+        # this footer with another file's rows
+        with open(LOCAL_CACHE, "rb") as f:
+            meta = json.loads(pq.read_schema(f).metadata[LOCAL_CACHE_META_KEY])
+            # Aged from the last full download, not the file's mtime: extending
+            # rewrites the file but never re-reads the older sets
+            if time.time() - meta["fetched_at"] > LOCAL_CACHE_MAX_AGE:
+                return None, None, None
+            f.seek(0)
+            data = pd.read_parquet(f)
+        # An all-empty note category reads back as plain object; re-cast it
+        # so the snapshot matches what enrich() builds (a no-op otherwise)
+        data["note"] = data["note"].astype("category")
+        return data, meta["fingerprint"], meta["fetched_at"]
+    except Exception:
+        return None, None, None
+
+def write_local_cache(data, fingerprint, fetched_at):
+    # Best effort: a read-only disk just means no snapshot. Written under a
+    # temporary name and renamed, so a crash mid-write leaves the old one intact
+    try:
+        table = pa.Table.from_pandas(data)
+        meta = json.dumps({"fingerprint": fingerprint, "fetched_at": fetched_at})
+        table = table.replace_schema_metadata({**table.schema.metadata, LOCAL_CACHE_META_KEY: meta})
+        tmp = LOCAL_CACHE.with_suffix(".tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, LOCAL_CACHE)
+    except Exception:
+        pass
+
+def extend_snapshot(data, cached, fingerprint):
+    # If the only change is sets logged after the snapshot, download just those.
+    # Anything else (deletes, back-dated rows) returns None -> full download.
+    added = (fingerprint["count"] or 0) - (cached.get("count") or 0)
+    if added <= 0 or not cached.get("latest"):
+        return None, None
+    new_rows, fetched = fetch_workouts(since=cached["latest"])
+    if len(new_rows) != added:
+        return None, None
+    # The extended snapshot is the old rows plus exactly these
+    fetched["count"] = cached["count"] + added
+    return pd.concat([new_rows, data], ignore_index=True).head(ROW_LIMIT), fetched
+
+def enrich(data):
+    if data.empty: return data
 
-    # 4. Derived Metrics
-    data["Actual Weight (kg)"] = data["Weight_Single_KG"] * data["Multiplier"]
-    data["Volume (kg)"] = data["Actual Weight (kg)"] * data["Reps"]
-    
+    # 2. Type Conversion. Dates are parsed first and unparseable rows dropped
+    # right away, so the remaining conversions only touch rows that are kept
+    # (cardio is already excluded by the query).
+    data["Date"] = pd.to_datetime(data["date"], format="ISO8601", errors="coerce", utc=True).dt.tz_localize(None)
+    data = data[data["Date"].notna()]
+    if data.empty: return data
+    # Midnight-floored datetime64 (not Python dates) keeps Day filters and groupbys vectorized
+    data["Day"] = data["Date"].dt.normalize()
+    # Categorical codes make the per-exercise groupbys cheap
+    data["Exercise"] = data["exercise"].astype("category")
+    # Narrow dtypes: weights fit in float32 and reps/set numbers in int16
+    data["Reps"] = pd.to_numeric(data["reps"], errors='coerce').fillna(0).astype("int16")
+    data["Weight_Single_KG"] = pd.to_numeric(data["weight_kg"], errors='coerce').fillna(0).astype("float32")
+    data["Multiplier"] = pd.to_numeric(data["multiplier"], errors='coerce').fillna(1).astype("float32")
+    data["Set_Order"] = pd.to_numeric(data["set_order"], errors='coerce').fillna(1).astype("int16")
+    # Notes repeat across every set of a session, so they are stored as codes too
+    data["note"] = data["note"].astype("category")
+
+    # 3. Derived Metrics (one NumPy pass; volume reuses the load buffer).
+    # Every derived float column stays float32, like its inputs.
+    load = data["Weight_Single_KG"].to_numpy() * data["Multiplier"].to_numpy()
+    data["Actual Weight (kg)"] = load
+    data["Volume (kg)"] = load * data["Reps"].to_numpy()
+
+    # 4. Strength Metrics: 1RM, PRs and Category
+    data["1RM_Estimate"] = estimate_1rm(data["Actual Weight (kg)"].to_numpy(), data["Reps"].to_numpy()).astype("float32")
+    data = assign_prs(data)
+    # Classify each distinct name once, then gather per row by category code
+    # (the appended "Other" is what code -1, a missing name, picks up)
+    ex = data["Exercise"].cat
+    kinds = pd.Categorical(np.append(classify_exercise(ex.categories.to_series()), "Other"))
+    data["Category"] = pd.Categorical.from_codes(kinds.codes[ex.codes.to_numpy()], kinds.categories)
+
+    # 5. Intensity Calculation (Relative to All-Time Max)
+    # Same code-indexed reduction as the PR pass instead of a groupby transform;
+    # rows without an exercise get NaN, as the groupby would give them
+    one_rm = data["1RM_Estimate"].to_numpy()
+    codes = ex.codes.to_numpy()
+    best = np.zeros(len(ex.categories) + 1, dtype="float32")  # last slot soaks up code -1
+    np.maximum.at(best, codes, one_rm)
+    all_time_maxes = np.where(codes >= 0, best[codes], np.float32("nan"))
+    # Bodyweight-only exercises have a 0 max; np.where discards those quotients
+    with np.errstate(invalid="ignore", divide="ignore"):
+        data["Intensity %"] = np.where(
+            load > 0, one_rm / all_time_maxes * 100, 0
+        ).astype("float32")
+    # Year-qualified ISO week as a compact int (202405), so week 5 of 2023 and
+    # week 5 of 2024 are separate buckets and the key sorts chronologically.
+    # Straight from Day's datetime64[D] view, no isocalendar() frame: each
+    # week's Thursday fixes its ISO year (day 0, 1970-01-01, was a Thursday).
+    d = data["Day"].to_numpy().astype("datetime64[D]")
+    thursday = d + (3 - (d.astype("int64") + 3) % 7)
+    iso_year = thursday.astype("datetime64[Y]")
+    week = (thursday - iso_year.astype("datetime64[D]")).astype("int64") // 7 + 1
+    data["Week"] = ((iso_year.astype("int64") + 1970) * 100 + week).astype("int32")
+
+    # 6. Set Numbering: rows arrive in set order, so one cumcount covers every day/exercise
+    data["Set #"] = data.groupby(["Day", "Exercise"], sort=False, observed=True).cumcount() + 1
     return data
 
-df = load_data()
+# Everything deterministic lives inside the cached loader, so widget
+# interactions reuse the fully enriched frame instead of rebuilding it.
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def load_data():
+    fingerprint = table_fingerprint()
+    data, cached, fetched_at = read_local_cache()
+    if data is None or cached != fingerprint:
+        # The snapshot keeps the raw columns next to the derived ones, so new
+        # sets can still be appended to it and the whole frame re-enriched
+        # (a snapshot missing any of them falls back to the full download)
+        has_raw = data is not None and set(RAW_COLUMNS).issubset(data.columns)
+        raw, fetched = extend_snapshot(data[RAW_COLUMNS], cached, fingerprint) if has_raw else (None, None)
+        if raw is None:
+            raw, fetched = fetch_workouts()
+            fetched_at = time.time()
+        data = enrich(raw)
+        # Saved under the fingerprint of what was downloaded, not of the probe,
+        # so a set logged in between is neither missed nor appended twice.
+        # An empty table has no columns to snapshot; the next load fetches again
+        if not data.empty:
+            write_local_cache(data, fetched, fetched_at)
+    # Stamped once per actual load: cached helpers below are keyed on it, so
+    # they can never serve results computed from a different load
+    version = time.time()
+    if data.empty: return data, [], [], pd.DataFrame(), version
+
+    # 7. Selectbox Options: newest day first as ready-made ISO labels (one
+    # vectorized conversion, no per-option format_func); categories are already sorted
+    days = np.datetime_as_string(np.sort(data["Day"].unique())[::-1], unit="D").tolist()
+    exercises = data["Exercise"].cat.categories.tolist()
+
+    # 8. Weekly Summary
+    weekly_summary = build_weekly_summary(data)
+    
+    return data, days, exercises, weekly_summary, version
+
+# st.cache_data hands back a fresh copy of the frame on every call; the
+# session keeps a reference instead, refreshed once the loader's TTL passes.
+# Everything below treats these as read-only: widget changes may only
+# recompute the selection and what is rendered from it.
+LOADED_KEYS = ("df", "days", "exercises", "weekly_summary", "data_version")
+if "df" not in st.session_state or time.time() - st.session_state["loaded_at"] > DATA_TTL:
+    st.session_state.update(zip(LOADED_KEYS, load_data()))
+    st.session_state["loaded_at"] = time.time()
+df, days, exercises, weekly_summary, data_version = (st.session_state[k] for k in LOADED_KEYS)
 
 if df.empty:
     st.warning("No data found in Supabase.")
     st.stop()
 
-# ---------- Calculations & Logic ---------- #
-
-# 1. Epley 1RM Formula
-def estimate_1rm(weight, reps):
-    return weight * (1 + reps/30) if reps and reps > 1 else weight
-
-df["1RM_Estimate"] = df.apply(lambda r: estimate_1rm(r["Actual Weight (kg)"], r["Reps"]), axis=1)
-
-# 2. PR Detection (Gold Medals)
-def assign_prs(data):
-    # Heaviest weight lifted for weighted exercises
-    prs_w = data[data["Actual Weight (kg)"] > 0].groupby("Exercise")["Actual Weight (kg)"].max().to_dict()
-    # Max reps for bodyweight exercises (0kg)
-    prs_r = data[data["Actual Weight (kg)"] == 0].groupby("Exercise")["Reps"].max().to_dict()
-    
-    data["PR"] = data.apply(
-        lambda r: (
-            "🏅" if (
-                (r["Actual Weight (kg)"] > 0 and r["Actual Weight (kg)"] == prs_w.get(r["Exercise"], 0)) or
-                (r["Actual Weight (kg)"] == 0 and r["Reps"] == prs_r.get(r["Exercise"], -1))
-            ) else ""
-        ),
-        axis=1
-    )
-    return data
+# ---------- Cached Selection Summaries ---------- #
+# Keyed on the data version and the widget values, so a rerun with an unchanged
+# selection skips the scans. The session's frame is passed in unhashed (leading
+# underscore) rather than re-read from load_data(), which would copy it.
+def selection_mask(data, view_mode, key, hide_light):
+    mask = (data["Exercise"] == key) if view_mode == "By Exercise" else (data["Day"] == key)
+    if hide_light:
+        mask &= data["Actual Weight (kg)"] >= 40
+    return mask
+
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def compute_summary(_data, version, view_mode, key, hide_light):
+    sub = _data.loc[selection_mask(_data, view_mode, key, hide_light), ["Volume (kg)", "Actual Weight (kg)", "Intensity %"]]
+    heaviest = sub["Actual Weight (kg)"].max() if not sub.empty else None
+    avg_int = sub.loc[sub["Actual Weight (kg)"] > 0, "Intensity %"].mean()
+    # Summed in float64 (as in the weekly summary): float32 storage, not float32 totals
+    return sub["Volume (kg)"].to_numpy(dtype="float64").sum(), len(sub), heaviest, avg_int
+
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def volume_split(_data, version, view_mode, key, hide_light):
+    sub = _data.loc[selection_mask(_data, view_mode, key, hide_light), ["Category", "Volume (kg)"]]
+    return sub.astype({"Volume (kg)": "float64"}).groupby("Category", observed=True)["Volume (kg)"].sum().reset_index()
+
+# cache_resource: the per-exercise series are shared read-only, so lookups
+# skip the deserialized copy st.cache_data would make of the whole table
+@st.cache_resource(ttl=DATA_TTL, show_spinner=False)
+def daily_best_1rm(_data, version):
+    # One groupby for every exercise; each trend is then just a dict lookup
+    best = _data.groupby(["Exercise", "Day"], observed=True)["1RM_Estimate"].max()
+    return {ex: s.droplevel("Exercise") for ex, s in best.groupby(level="Exercise", sort=False, observed=True)}
+
+# Above this many daily points the line is drawn from weekly bests instead;
+# at chart width the extra points add payload, not detail
+MAX_TREND_POINTS = 150
+
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def strength_trend(_data, version, exercise, weeks, today):
+    # today is an argument (not read from the clock here) so the cached
+    # cutoff moves on at midnight instead of waiting for the TTL
+    cutoff = today - timedelta(weeks=weeks)
+    trend = daily_best_1rm(_data, version).get(exercise)
+    if trend is None:
+        return pd.DataFrame(columns=["Day", "1RM_Estimate"])
+    # The Day index comes out of the groupby sorted, so the cutoff is a binary search
+    trend = trend.iloc[trend.index.searchsorted(cutoff):]
+    if len(trend) > MAX_TREND_POINTS:
+        # Each week's best day, at its own date (resample would label it with
+        # the week-ending Sunday, which may be a rest day or still ahead)
+        trend = trend.loc[trend.groupby(trend.index.to_period("W")).idxmax()]
+    return trend.reset_index()
+
+# Detailed log table: the projection, renaming, string formatting and row
+# order depend only on the selection, so they are cached with it too
+COLUMN_MAPPING = {
+    "Reps": "Reps",
+    "Weight_Single_KG": "Weight (1 Unit)",
+    "Actual Weight (kg)": "Total Load",
+    "Volume (kg)": "Volume",
+    "Intensity %": "Intensity",
+    "PR": "PR"
+}
+DISPLAY_COLS = list(COLUMN_MAPPING.values())
+# Display formats are applied by the browser grid, so no Styler walks the
+# table cell by cell in Python and the numeric columns still sort as numbers
+TABLE_COLUMNS = {
+    "Day": st.column_config.DateColumn(format="YYYY-MM-DD"),
+    "Total Load": st.column_config.NumberColumn(format="%.1f kg"),
+    "Weight (1 Unit)": st.column_config.NumberColumn(format="%.1f kg"),
+    "Volume": st.column_config.NumberColumn(format="%,d"),
+    "Intensity": st.column_config.NumberColumn(format="%.0f%%")
+}
 
-df = assign_prs(df)
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def detail_table(_data, version, view_mode, key, hide_light):
+    rows = _data.loc[selection_mask(_data, view_mode, key, hide_light), ["Exercise", "Date", "Day", "Set #", *COLUMN_MAPPING]]
+    table = rows.rename(columns=COLUMN_MAPPING)
+    # Whole kilograms for the thousands-separated Volume format (rounds like "{:,.0f}")
+    table["Volume"] = np.rint(table["Volume"].to_numpy()).astype("int64")
+    table["PR"] = np.where(table["PR"], "🏅", "")
+    if view_mode == "By Date":
+        # Whole day in one table, exercises in the order they were performed
+        first_seen = pd.factorize(table["Exercise"])[0]
+        return table.iloc[np.argsort(first_seen, kind="stable")].loc[:, ["Exercise", *DISPLAY_COLS]]
+    # By Exercise Mode: Show Date column too
+    table = table.sort_values(["Date", "Set #"], ascending=[False, True])
+    return table.loc[:, ["Day", *DISPLAY_COLS]]
 
-# 3. Workout Classification (Push/Pull/Lower)
-def classify_exercise(name):
-    n = str(name).lower()
-    lowers = ["squat","deadlift","lunge","leg","hamstring","calf","hip thrust","thrust","glute","rdl","good morning"]
-    pushes = ["bench","overhead press","shoulder press","incline","dip","push","tricep","pec"]
-    pulls = ["row","pulldown","pull-up","curl","face pull","shrug","chin","lat"]
-    if any(k in n for k in lowers): return "Lower"
-    if any(k in n for k in pushes): return "Push"
-    if any(k in n for k in pulls): return "Pull"
-    return "Other"
-
-df["Category"] = df["Exercise"].apply(classify_exercise)
-
-# 4. Intensity Calculation (Relative to All-Time Max)
-all_time_maxes = df.groupby("Exercise")["1RM_Estimate"].max().to_dict()
-df["Intensity %"] = df.apply(
-    lambda r: (r["1RM_Estimate"] / all_time_maxes.get(r["Exercise"], 1)) * 100 
-    if r["Actual Weight (kg)"] > 0 else 0, 
-    axis=1
-)
+# Serialized once per data load rather than on every rerun; bytes are
+# immutable, so cache_resource can hand out the same object each time
+@st.cache_resource(ttl=DATA_TTL, show_spinner=False)
+def full_export_csv(_data, version):
+    # The file keeps its original columns: the medal rather than the stored
+    # bool, and the ISO week number rather than the year-qualified key
+    export = _data.assign(PR=np.where(_data["PR"], "🏅", ""), Week=_data["Week"] % 100)
+    return export.to_csv(index=False).encode("utf-8")
 
-# 5. Weekly Summary Aggregation
-df["Week"] = df["Date"].dt.isocalendar().week
-weekly_summary = (
-    df.groupby("Week", as_index=False)
-      .agg({
-          "Volume (kg)": "sum",
-          "Actual Weight (kg)": "max",
-          "Reps": "sum",
-          "Exercise": "nunique"
-      })
-      .rename(columns={
-          "Volume (kg)": "Total Volume",
-          "Actual Weight (kg)": "Heaviest Lift",
-          "Reps": "Total Reps",
-          "Exercise": "Unique Exercises"
-      })
-      .sort_values("Week", ascending=False)
-)
+# Read from the clock once per rerun
+TODAY = pd.Timestamp.today().normalize()
 
 # ---------- Sidebar & Filters ---------- #
 st.sidebar.title("Filters & Settings")
 view_mode = st.sidebar.radio("View Mode", ("By Date", "By Exercise"))
 hide_light = st.sidebar.checkbox("Azim View™ – Hide <40kg sets")
-weeks_count = st.sidebar.slider("Trend Horizon (Weeks)", 2, 52, 12)
 
 # Debug Info
 st.sidebar.divider()
 st.sidebar.caption(f"Total Rows: {len(df)}")
-st.sidebar.caption(f"Latest Data: {df['Day'].max()}")
+st.sidebar.caption(f"Latest Data: {days[0]}")  # days is already newest-first
 
 # ---------- Selection Logic ---------- #
 if view_mode == "By Date":
-    days = sorted(df["Day"].unique(), reverse=True)
-    sel_day = st.sidebar.selectbox("Select a date", days)
-    df_sel = df[df["Day"] == sel_day].copy()
+    sel_day = pd.Timestamp(st.sidebar.selectbox("Select a date", days))
+    sel_key = sel_day
+    in_day = (df["Day"] == sel_day).to_numpy()
     
-    # Get workout name from notes if available
-    workout_name = df_sel["note"].iloc[0] if not df_sel.empty and df_sel["note"].iloc[0] else "Workout"
-    title = f"🗓️ {sel_day} | {workout_name}"
+    # Get workout name from notes if available (first set of the day, before the "Azim View" cut)
+    # (a missing categorical note comes back as NaN, which is truthy)
+    note = df["note"].iat[in_day.argmax()] if in_day.any() else None
+    workout_name = note if pd.notna(note) and note else "Workout"
+    title = f"🗓️ {sel_day:%Y-%m-%d} | {workout_name}"
+
+    # The trend follows the day's first exercise left after the "Azim View" cut.
+    # Metrics, pie and log come from cached helpers, so no frame is sliced here.
+    # (a new array: under copy-on-write the to_numpy() views are read-only)
+    if hide_light:
+        in_day = in_day & (df["Actual Weight (kg)"].to_numpy() >= 40)
+    target_ex = df["Exercise"].iat[in_day.argmax()] if in_day.any() else None
 else:
-    exercises = sorted(df["Exercise"].unique())
     sel_ex = st.sidebar.selectbox("Select an exercise", exercises)
-    df_sel = df[df["Exercise"] == sel_ex].copy()
+    sel_key = sel_ex
+    target_ex = sel_ex
     title = f"📈 {sel_ex}"
 
-# Apply "Azim View" Filter
-if hide_light:
-    df_sel = df_sel[df_sel["Actual Weight (kg)"] >= 40]
-
 # ---------- Dashboard Header Metrics ---------- #
 st.header(title)
 c1, c2, c3, c4 = st.columns(4)
-c1.metric("Total Volume", f"{df_sel['Volume (kg)'].sum():,.0f} kg")
-c2.metric("Total Sets", len(df_sel))
-c3.metric("Heaviest Lift", f"{df_sel['Actual Weight (kg)'].max():.1f} kg" if not df_sel.empty else "—")
-avg_int = df_sel[df_sel['Actual Weight (kg)'] > 0]['Intensity %'].mean()
+total_vol, total_sets, heaviest, avg_int = compute_summary(df, data_version, view_mode, sel_key, hide_light)
+c1.metric("Total Volume", f"{total_vol:,.0f} kg")
+c2.metric("Total Sets", total_sets)
+c3.metric("Heaviest Lift", f"{heaviest:.1f} kg" if heaviest is not None else "—")
 c4.metric("Avg Intensity", f"{avg_int:.1f}%" if not pd.isna(avg_int) else "0%")
 
 # ---------- Weekly Summary (Expander) ---------- #
@@ -179,30 +474,33 @@ with st.expander("Weekly Summary (Last 4 Weeks)"):
     st.dataframe(weekly_summary.head(4), use_container_width=True, hide_index=True)
 
 # ---------- Visualizations ---------- #
+# A fragment: moving the horizon slider reruns only this chart, not the page.
+# (Fragments cannot write to the sidebar, so the slider sits above the chart.)
+@st.fragment
+def trend_chart(exercise):
+    weeks_count = st.slider("Trend Horizon (Weeks)", 2, 52, 12)
+    chart_data = strength_trend(df, data_version, exercise, weeks_count, TODAY)
+    if not chart_data.empty:
+        chart = alt.Chart(chart_data).mark_line(point=True, color="#ff4b4b").encode(
+            x=alt.X("Day:T", title="Date", axis=alt.Axis(format="%b %d")),
+            y=alt.Y("1RM_Estimate:Q", title="Est. 1RM (kg)", scale=alt.Scale(zero=False)),
+            tooltip=[alt.Tooltip("Day:T", format="%Y-%m-%d"), alt.Tooltip("1RM_Estimate", format=".1f")]
+        ).properties(height=300, title=f"Strength Progression: {exercise}")
+        st.altair_chart(chart, use_container_width=True)
+
 st.subheader("Analysis")
 col_chart, col_pie = st.columns([2, 1])
 
 with col_chart:
     # 1RM Trend Chart
-    cutoff = pd.Timestamp.today() - timedelta(weeks=weeks_count)
-    target_ex = sel_ex if view_mode == "By Exercise" else (df_sel["Exercise"].iloc[0] if not df_sel.empty else None)
-    
     if target_ex:
-        trend_data = df[(df["Exercise"] == target_ex) & (df["Date"] >= cutoff)]
-        if not trend_data.empty:
-            chart_data = trend_data.groupby("Day")["1RM_Estimate"].max().reset_index()
-            chart = alt.Chart(chart_data).mark_line(point=True, color="#ff4b4b").encode(
-                x=alt.X("Day:T", title="Date", axis=alt.Axis(format="%b %d")),
-                y=alt.Y("1RM_Estimate:Q", title="Est. 1RM (kg)", scale=alt.Scale(zero=False)),
-                tooltip=["Day", alt.Tooltip("1RM_Estimate", format=".1f")]
-            ).properties(height=300, title=f"Strength Progression: {target_ex}")
-            st.altair_chart(chart, use_container_width=True)
+        trend_chart(target_ex)
     else:
         st.info("Select an exercise to see trends.")
 
 with col_pie:
     # Volume Split Pie Chart
-    pie_data = df_sel.groupby("Category")["Volume (kg)"].sum().reset_index()
+    pie_data = volume_split(df, data_version, view_mode, sel_key, hide_light)
     pie = alt.Chart(pie_data).mark_arc(innerRadius=50).encode(
         theta=alt.Theta("Volume (kg)", stack=True),
         color=alt.Color("Category", scale=alt.Scale(scheme='category10')),
@@ -212,11 +510,11 @@ with col_pie:
 
 # ---------- Coach's Corner (ACWR) ---------- #
 st.divider()
-if len(weekly_summary) >= 2:
-    acute = weekly_summary["Total Volume"].iloc[0] # Current week
-    # Calculate chronic load (avg of previous 4 weeks)
-    chronic_series = weekly_summary["Total Volume"].iloc[1:5]
-    chronic = chronic_series.mean() if not chronic_series.empty else 0
+weekly_volume = weekly_summary["Total Volume"].to_numpy()
+if weekly_volume.size >= 2:
+    acute = weekly_volume[0] # Current week
+    # Calculate chronic load (avg of previous 4 weeks; at least one exists here)
+    chronic = weekly_volume[1:5].mean()
     
     if chronic > 0:
         ratio = acute / chronic
@@ -237,64 +535,22 @@ if len(weekly_summary) >= 2:
 st.divider()
 st.subheader("📋 Detailed Log")
 
-# Prepare the display dataframe
-display_df = df_sel.copy()
-
-# Format Intensity as string percentage
-display_df["Intensity"] = display_df["Intensity %"].map("{:.0f}%".format)
-
-# Rename columns for human readability
-column_mapping = {
-    "Reps": "Reps",
-    "Weight_Single_KG": "Weight (1 Unit)",
-    "Actual Weight (kg)": "Total Load",
-    "Volume (kg)": "Volume",
-    "Intensity": "Intensity",
-    "PR": "PR",
-    "set_order": "Set Order" # Kept for internal sorting, hidden later
-}
-display_df = display_df.rename(columns=column_mapping)
-
-# Define columns to show
-cols_to_show = ["Reps", "Weight (1 Unit)", "Total Load", "Volume", "Intensity", "PR"]
-
-if view_mode == "By Date":
-    # Group by exercise for cleaner daily view
-    for ex in df_sel["Exercise"].unique():
-        st.caption(f"**{ex}**")
-        # Filter for this exercise
-        ex_df = display_df[display_df["Exercise"] == ex]
-        # Sort by the hidden set_order column
-        ex_df = ex_df.sort_values("Set Order")
-        # Display nicely formatted table without index
-        st.dataframe(
-            ex_df[cols_to_show].style.format({
-                "Total Load": "{:.1f} kg",
-                "Weight (1 Unit)": "{:.1f} kg",
-                "Volume": "{:,.0f}"
-            }), 
-            use_container_width=True, 
-            hide_index=True
-        )
-else:
-    # By Exercise Mode: Show Date column too
-    display_df = display_df.sort_values(["Date", "Set Order"], ascending=[False, True])
-    final_cols = ["Day"] + cols_to_show
-    st.dataframe(
-        display_df[final_cols].style.format({
-            "Total Load": "{:.1f} kg",
-            "Weight (1 Unit)": "{:.1f} kg",
-            "Volume": "{:,.0f}"
-        }), 
-        use_container_width=True, 
-        hide_index=True
-    )
+# One table for the selection: a single st.dataframe ships one Arrow
+# payload instead of one per exercise
+st.dataframe(
+    detail_table(df, data_version, view_mode, sel_key, hide_light),
+    column_config=TABLE_COLUMNS,
+    use_container_width=True,
+    hide_index=True
+)
 
 # ---------- Download Data ---------- #
 st.divider()
+# The loaded log: the projected Supabase columns plus the derived ones,
+# not every column of the table
 st.download_button(
-    "📥 Download Full Database (CSV)", 
-    df.to_csv(index=False).encode("utf-8"), 
+    "📥 Download Workout Log (CSV)", 
+    full_export_csv(df, data_version), 
     "julien_workouts_full.csv", 
     "text/csv"
 )